@@ -1,3 +1,4 @@
+import os
 import click
 from .link_checker import link_check_reporter
 
@@ -11,7 +12,25 @@ def cli():
 @click.option('--archive', '-a', is_flag=True, help='Archive 200-OK links')
 @click.option('--strong-archive', '-A', is_flag=True, help='Archive not 404 links')
 @click.option('--grab-screenshots', '-s', is_flag=True, help="Grab screenshots.")
-def link_check(path, archive, strong_archive, grab_screenshots):
+@click.option('--method', '-m', type=click.Choice(['auto', 'head', 'get']), default='auto',
+              help='HTTP request method (auto: HEAD, falling back to GET if HEAD is refused)')
+@click.option('--concurrency', '-c', type=click.IntRange(min=1), default=20,
+              help='Maximum number of links to check at the same time')
+@click.option('--per-host', type=click.IntRange(min=1), default=4,
+              help='Maximum number of links to check at the same time on any one host')
+@click.option('--max-rate', type=click.FloatRange(min=0, min_open=True), default=5,
+              help='Maximum number of requests per second to any one host')
+@click.option('--refresh', '-r', is_flag=True, help='Check all links again, ignoring cached results from previous runs')
+@click.option('--cache-file', type=click.Path(dir_okay=False), default='linkcheck_cache.json',
+              help='File to save link check results to, for reuse by later runs')
+@click.option('--no-cache', is_flag=True, help='Do not read or save a link check results cache file')
+@click.option('--workers', '-w', type=click.IntRange(min=1), default=os.cpu_count() or 1,
+              help='Number of processes to use when extracting links from several files')
+def link_check(path, archive, strong_archive, grab_screenshots, method, concurrency, per_host, max_rate, refresh, cache_file, no_cache, workers):
 	"""Link reports for OU-XML files in specified directory."""
 	click.echo('Using file/directory: {}'.format(path))
-	link_check_reporter(path,archive, strong_archive, grab_screenshots)
\ No newline at end of file
+	link_check_reporter(path,archive, strong_archive, grab_screenshots,
+	                    method=method, concurrency=concurrency,
+	                    per_host=per_host, max_rate=max_rate, refresh=refresh,
+	                    cache_file=None if no_cache else cache_file,
+	                    max_workers=workers)
\ No newline at end of file
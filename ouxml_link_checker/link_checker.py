@@ -33,30 +33,37 @@ import unicodedata
 def flatten(el):
     ''' Utility function for flattening XML tags. '''
     if el is None: return
-    result = [ (el.text or "") ]
-    for sel in el:
-        result.append(flatten(sel))
-        result.append(sel.tail or "")
-    return unicodedata.normalize("NFKD", "".join(result)) or ' '
+    # itertext() walks the element and its children in C
+    text = "".join(el.itertext())
+    # Normalising pure ASCII text would leave it unchanged
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+    return text or ' '
 
 
 # -
 
 # Iterating through a list of links and making a web request for each one can happen quickly, especially if we are just requesting page headers and not the complete contents of a page.
 #
-# A trick many screenscrapers use is to add a small delay between requests, often randomising the delay times to make it less obvious that a scrape is in play. THhe following function gives a minimal function that helps us play nice when creating lots of web requests.
+# A trick many screenscrapers use is to add a small delay between requests. Rather than wait between every request, we only need to wait between consecutive requests to the same host: requests to different hosts can go ahead straight away. The following function helps us play nice when creating lots of web requests.
 
 # +
-# Wait for a short random interval
-# This is so we don't clobber a particular website or the network too badly!
+# Wait until enough time has passed since the last request to the same host
+# This is so we don't clobber a particular website too badly!
 
 import time
-from random import random
+from collections import defaultdict
+from urllib.parse import urlsplit
 
-def play_nice(delay=0.1, min_delay=0.01):
-    """Add a random delay between consecutive web requests."""
-    # It would probably make more sense to do this to throttle multiple requests to the same domain
-    time.sleep(min_delay + delay*random())
+_LAST_HIT = defaultdict(float)
+
+def wait_for_host(url, min_interval=0.1):
+    """Space out consecutive web requests to the same host by at least min_interval seconds."""
+    host = urlsplit(url).netloc
+    wait = min_interval - (time.monotonic() - _LAST_HIT[host])
+    if wait > 0:
+        time.sleep(wait)
+    _LAST_HIT[host] = time.monotonic()
 
 
 # -
@@ -66,12 +73,13 @@ def play_nice(delay=0.1, min_delay=0.01):
 # +
 # Get a list of xml files in a folder/directory
 
-import os
 from pathlib import Path
 
-def get_xml_files(path_str='.', suffix='.xml'):
+def get_xml_files(path_str='.', suffix='.xml', recursive=False):
     path = Path(path_str)
-    docs = [path/x for x in os.listdir(path) if x.endswith(suffix)]
+    # Optionally search subdirectories too
+    matches = path.rglob(f'*{suffix}') if recursive else path.glob(f'*{suffix}')
+    docs = [doc for doc in matches if doc.is_file()]
     return docs
 
 
@@ -94,21 +102,21 @@ from tqdm import tqdm
 # +
 # Open an XML file/document, read its contents and parse them as an XML etree object
 
+import re
 from lxml import etree
 
+# Processing instructions that can trip up the parser
+# (the XML declaration is kept so that lxml can tell how the document is encoded)
+_PI_RE = re.compile(rb'<\?(?:sc-transform-do-oumusic-to-unicode|sc-transform-do-oxy-pi)\?>')
+
 def get_xml_from_doc(doc, clean=True):
     """Read file and parse as XML object."""
-    xml = doc.read_text()
+    xml = doc.read_bytes()
     
     if clean:
-        for cleaner in ['<?sc-transform-do-oumusic-to-unicode?>',
-                        '<?sc-transform-do-oxy-pi?>',
-                        '<?xml version="1.0" encoding="utf-8"?>',
-                        '<?xml version="1.0" encoding="UTF-8"?>',
-                        '<?xml version="1.0" encoding="UTF-8" standalone="no"?>']:
-            xml = xml.replace(cleaner, '')
+        xml = _PI_RE.sub(b'', xml)
             
-    xml_root = etree.fromstring(xml)
+    xml_root = etree.fromstring(xml, parser=etree.XMLParser(recover=True, huge_tree=True))
     return xml_root
 
 
@@ -123,59 +131,140 @@ def get_xml_from_doc(doc, clean=True):
 # +
 # Extract metadata and links from a parsed OU-XML document
 
+from urllib.parse import urlunsplit
+
+# Compile the XPath expressions we use once, rather than every time we use them
+_XP_SECTIONS = etree.XPath('.//Session | .//BackMatter')
+_XP_LINKS = etree.XPath('.//a[@href]')
+
+# Only http(s) links can be checked, so skip local anchors, mailto: links, etc.
+_VALID_SCHEMES = ('http://', 'https://')
+
+# Links using OU authentication have this suffix on their domain
+_EZ = '.libezproxy.open.ac.uk'
+
+def _normalise_url(url):
+    """Normalise a URL so that trivially different forms of the same URL compare equal."""
+    try:
+        p = urlsplit(url)
+    except ValueError:
+        return url
+    return urlunsplit((p.scheme.lower(), p.netloc.lower(), p.path or '/', p.query, ''))
+
+
+def _section_links(section, unique_links, unique_set):
+    """Extract the (text, URL) pairs for the checkable links in a section, noting any new unique URLs.
+    
+    Links are reported as they appear in the document, less any libezproxy component,
+    but are only counted as unique if their normalised forms differ."""
+    _links = []
+    for l in _XP_LINKS(section):
+        # Ignore any whitespace around the link, as a browser would
+        href = l.get('href').strip()
+        if not href.lower().startswith(_VALID_SCHEMES):
+            continue
+        _lhref = href.replace(_EZ, '')
+        key = _normalise_url(_lhref)
+        if key not in unique_set:
+            unique_set.add(key)
+            unique_links.append(_lhref)
+        _links.append((flatten(l), _lhref))
+    return _links
+
+
+_METADATA_TAGS = {'CourseCode': 'coursecode',
+                  'CourseTitle': 'coursetitle',
+                  'ItemTitle': 'itemtitle'}
+
 def parse_ouxml_metadata(courseRoot):
     """Extract some metadata from the OU-XML file."""
-    _coursecode = courseRoot.find('.//CourseCode')
-    coursecode = flatten(_coursecode)
-    _coursetitle = courseRoot.find('.//CourseTitle')
-    coursetitle = flatten(_coursetitle)
-
-    _itemtitle = courseRoot.find('.//ItemTitle')
-    itemtitle = flatten(_itemtitle)
-
-    metadata = {'coursecode': coursecode,
-                'coursetitle': coursetitle,
-                'itemtitle': itemtitle,
-               }
+    # Find the first of each metadata element in a single pass over the tree
+    found = {}
+    for el in courseRoot.iter(*_METADATA_TAGS):
+        found.setdefault(el.tag, el)
+        if len(found) == len(_METADATA_TAGS):
+            break
+
+    metadata = {key: flatten(found.get(tag)) for tag, key in _METADATA_TAGS.items()}
     return metadata
 
 
-def extract_links_from_doc(courseRoot, unique_links=None):
+def extract_links_from_doc(courseRoot, unique_links=None, unique_set=None):
     """Extract links from OU-XML document."""
     unique_links = [] if unique_links is None else unique_links
+    # Use a set alongside the ordered list for quick membership tests
+    unique_set = {_normalise_url(url) for url in unique_links} if unique_set is None else unique_set
     links = {}
+    backmatter_links = []
 
     # Grab some metadata
     metadata = parse_ouxml_metadata(courseRoot)
-    sessions = courseRoot.findall('.//Session')
-    
-    for session in sessions:
-        _links = []
-        session_title = flatten(session.find('.//Title'))
-        
-        for l in session.findall('.//a'):
-            _lhref = l.get('href').replace('.libezproxy.open.ac.uk','')
-            if l not in unique_links:
-                unique_links.append(_lhref)
-                _links.append((flatten(l), _lhref))
 
-        links[session_title] = _links
+    # Find the sessions and the <BackMatter> in a single pass over the document
+    for section in _XP_SECTIONS(courseRoot):
+        _links = _section_links(section, unique_links, unique_set)
+
+        if section.tag == 'Session':
+            links[flatten(next(section.iter('Title'), None))] = _links
+        else:
+            backmatter_links = _links
 
     # <BackMatter>
-    backmatter = courseRoot.find('.//BackMatter')
-    _links = []
-    for l in backmatter.findall('.//a'):
-        _lhref = l.get('href').replace('.libezproxy.open.ac.uk','')
-        if l not in unique_links:
-            unique_links.append(_lhref)
-            _links.append((flatten(l), _lhref))
-    links['BackMatter'] = _links
+    links['BackMatter'] = backmatter_links
     
     doc_links = {'metadata': metadata, 'sessions': links}
     
     return doc_links, unique_links
 
 
+# -
+
+# For large OU-XML documents, we don't need to load the whole document into memory just to pull out a handful of metadata elements and the links from each session. Instead, we can stream through the document using `etree.iterparse` and process each `Session` as soon as it has been parsed, clearing it out of memory once we're done with it.
+#
+# Parsing in recovery mode also means we don't need to clean up processing instructions that may otherwise trip up the parser.
+
+# +
+# Stream links and metadata from an OU-XML document file
+
+def extract_links_streaming(doc, unique_links=None, unique_set=None):
+    """Extract metadata and links from an OU-XML document file by streaming through it."""
+    unique_links = [] if unique_links is None else unique_links
+    unique_set = {_normalise_url(url) for url in unique_links} if unique_set is None else unique_set
+    metadata = {key: None for key in _METADATA_TAGS.values()}
+    links = {}
+    backmatter_links = []
+
+    tags = ('Session', 'BackMatter', *_METADATA_TAGS)
+    # Processing instructions and comments are never reported, so don't keep them in the tree
+    events = etree.iterparse(str(doc), events=('end',), tag=tags, recover=True,
+                             huge_tree=True, remove_pis=True, remove_comments=True)
+    for _, el in events:
+        if el.tag in _METADATA_TAGS:
+            key = _METADATA_TAGS[el.tag]
+            if metadata[key] is None:
+                metadata[key] = flatten(el)
+            continue
+
+        _links = _section_links(el, unique_links, unique_set)
+
+        if el.tag == 'Session':
+            links[flatten(next(el.iter('Title'), None))] = _links
+        else:
+            backmatter_links = _links
+
+        # Free up the memory used by elements we have finished with
+        el.clear()
+        while el.getprevious() is not None:
+            del el.getparent()[0]
+
+    # <BackMatter>
+    links['BackMatter'] = backmatter_links
+
+    doc_links = {'metadata': metadata, 'sessions': links}
+
+    return doc_links, unique_links
+
+
 # -
 
 # We can extract the links from a set of documents by extracting the links from each separate document in turn.
@@ -186,19 +275,50 @@ def extract_links_from_doc(courseRoot, unique_links=None):
 # - a list of URLs associated with each OU-XML document, broken down by session.
 #
 # Note: there is also the notion of a `Unit` block element in the OU-XML definition but that is not currently parsed as a particular unit of organisation.
+#
+# Each document can be parsed independently of the others, so where there are several documents we can optionally parse them in parallel, by setting `max_workers` to the number of worker processes to use. (Worker processes may not be able to find functions defined in a notebook, in which case the documents are parsed one after the other instead.) The unique links found in each document are then merged, in document order.
 
 # +
 # Extract all the links from a set of documents
 
-def extract_links_from_docs(docs):
-    """Process a set of OU-XML documents and extract unique links from them all."""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+def _parse_one(doc):
+    """Extract the links from a single OU-XML document file."""
+    _doc_links, _unique_links = extract_links_streaming(doc)
+    _doc_links['metadata']['file'] = str(doc)
+    return _doc_links, _unique_links
+
+
+def extract_links_from_docs(docs, max_workers=None):
+    """Process a set of OU-XML documents and extract unique links from them all.
+    
+    Documents are parsed in up to `max_workers` worker processes, or in this process if `max_workers` is None."""
     docs = docs if isinstance(docs, list) else [docs]
+
+    results = None
+    if len(docs) > 1 and max_workers and max_workers > 1:
+        # Send documents to worker processes in batches when there are lots of them
+        chunksize = max(1, len(docs) // (4 * max_workers))
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(_parse_one, docs, chunksize=chunksize))
+        except BrokenProcessPool:
+            # Worker processes can't always import functions defined in __main__ (eg in a notebook)
+            results = None
+    if results is None:
+        results = [_parse_one(doc) for doc in docs]
+
     unique_links = []
+    unique_set = set()
     doc_links = []
-    for doc in docs:
-        xml = get_xml_from_doc(doc)
-        _doc_links, unique_links = extract_links_from_doc(xml, unique_links)
-        _doc_links['metadata']['file'] = str(doc)
+    for _doc_links, _unique_links in results:
+        for url in _unique_links:
+            key = _normalise_url(url)
+            if key not in unique_set:
+                unique_set.add(key)
+                unique_links.append(url)
         doc_links.append(_doc_links)
         
     return doc_links, unique_links
@@ -222,36 +342,79 @@ def extract_links_from_docs(docs):
 #
 # *TO DO: where appropriate/informative, consider reports for the full range of [`2xx` success](https://en.wikipedia.org/wiki/List_of_HTTP_status_codes#2xx_success) reponse codes, [`3xx` redirection](https://en.wikipedia.org/wiki/List_of_HTTP_status_codes#3xx_redirection) codes, [`4xx` client error](https://en.wikipedia.org/wiki/List_of_HTTP_status_codes#4xx_client_errors) codes and [`5xx` server error](https://en.wikipedia.org/wiki/List_of_HTTP_status_codes#5xx_server_errors) codes.*
 #
-# At the moment, all links are checked, even if they are duplicates.
+# Each step in resolving a link is reported as a tuple `(ok, url, status_code, reason, method)`, where `method` is the HTTP method (`HEAD` or `GET`) used to make the request.
+#
+# Each unique link is only checked once (see below).
+
+# Rather than open a new connection for every request, we can use a `requests` session that keeps connections alive and reuses them for further requests to the same host. The session will also retry requests that fail because of a temporary network blip or a temporary server error, waiting a few seconds at most if the server asks us to come back later.
 
 # +
 # Run a link check on a single link
 
 import requests
-
-def link_reporter(url, display=False, redirect_log=True):
-    """Attempt to resolve a URL and report on how it was resolved."""
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Temporary server errors that are worth retrying
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Don't let a server's Retry-After header hold up a link check for too long
+_MAX_RETRY_AFTER = 5
+
+class _CappedRetry(Retry):
+    """Retry configuration that waits no longer than _MAX_RETRY_AFTER seconds for a Retry-After header."""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, _MAX_RETRY_AFTER)
+
+
+_SESSION = requests.Session()
+# Retry connection errors and temporary server errors, backing off between attempts,
+# but report the final response rather than raising if the server is still failing
+_RETRY = _CappedRetry(total=3, backoff_factor=0.3,
+                      status_forcelist=_RETRY_STATUSES,
+                      allowed_methods=frozenset({'HEAD', 'GET'}),
+                      respect_retry_after_header=True, raise_on_status=False)
+_ADAPTER = HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=_RETRY)
+_SESSION.mount('http://', _ADAPTER)
+_SESSION.mount('https://', _ADAPTER)
+
+# Some servers refuse HEAD requests, so we may need to retry with a GET
+_HEAD_FALLBACK_STATUSES = {403, 405, 501}
+
+def link_reporter(url, display=False, redirect_log=True, method='auto', timeout=(5, 10)):
+    """Attempt to resolve a URL and report on how it was resolved.
+    
+    The `method` may be `head`, `get`, or `auto` (try HEAD, fall back to GET if the HEAD request is refused).
+    The `timeout` is a (connect, read) pair of timeouts in seconds."""
     if display:
         print(f"Checking {url}...")
     
     # Make request and follow redirects
     try:
-        r = requests.head(url, allow_redirects=True)
-    except:
+        r = None
+        wait_for_host(url)
+        if method != 'get':
+            r = _SESSION.head(url, allow_redirects=True, timeout=timeout)
+        if method == 'get' or (method == 'auto' and r.status_code in _HEAD_FALLBACK_STATUSES):
+            # Stream the response so that we only fetch the headers, not the body
+            r = _SESSION.get(url, allow_redirects=True, timeout=timeout, stream=True)
+            r.close()
+    except (requests.RequestException, ValueError):
         r = None
     
     if r is None:
-        return [(False, url, None, "Error resolving URL")]
+        return [(False, url, None, "Error resolving URL", None)]
 
     # Optionally create a report including each step of redirection/resolution
     steps = r.history + [r] if redirect_log else [r]
     
     step_reports = []
     for step in steps:
-        step_report = (step.ok, step.url, step.status_code, step.reason)
+        step_report = (step.ok, step.url, step.status_code, step.reason, step.request.method)
         step_reports.append( step_report )
         if display:
-            txt_report = f'\tok={step.ok} :: {step.url} :: {step.status_code} :: {step.reason}\n'
+            txt_report = f'\tok={step.ok} :: {step.url} :: {step.status_code} :: {step.reason} :: {step.request.method}\n'
             print(txt_report)
 
     return step_reports
@@ -280,6 +443,245 @@ def link_reporter(url, display=False, redirect_log=True):
 # link_reporter(url_ezproxy_clean)
 # -
 
+# The same URL may be referenced many times, across many sessions and documents, so we cache link reports and only ever check each URL once per run. URLs are normalised before they are cached so that trivially different forms of the same URL (for example, `HTTP://Example.com/x`, `http://example.com/x` and `http://example.com/x#top`) share the same link report.
+#
+# Link reports always include the full redirect log when they are cached; if we don't want the redirect log, we just return the final step from the cached report.
+#
+# The cache can also be saved to a file and loaded again by a later run, so that re-running a link check doesn't need to check every link again. Cached reports expire after a day by default. Only reports for links that resolve (`2xx` and `3xx` status codes) or that have definitely gone (`404 Not Found` and `410 Gone`) are saved; links that could not be resolved at all, or that gave a temporary error such as `429 Too Many Requests` or a `5xx` server error, are always checked again. The same rules apply to link reports cached in memory by an earlier link check in the same session (for example, in a notebook); clear the cache (or call `link_check_reporter()` with `refresh=True`) to check every link again.
+
+# +
+# Cache link reports by normalised URL
+
+import json
+
+_URL_CACHE = {}
+# When each cached link report was created
+_URL_CACHE_CHECKED = {}
+# How long cached link reports can be reused for, in seconds
+_CACHE_EXPIRE_AFTER = 86400
+
+def _cache_report(key, link_report):
+    """Add a link report to the cache."""
+    _URL_CACHE[key] = link_report
+    _URL_CACHE_CHECKED[key] = time.time()
+
+
+def clear_link_cache():
+    """Clear cached link reports so that links are checked again."""
+    _URL_CACHE.clear()
+    _URL_CACHE_CHECKED.clear()
+
+
+def load_link_cache(cache_file='linkcheck_cache.json', expire_after=_CACHE_EXPIRE_AFTER):
+    """Load unexpired link reports saved to a cache file by a previous run."""
+    try:
+        with open(cache_file) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return
+
+    now = time.time()
+    loaded = {}
+    try:
+        for key, (checked, link_report) in cached.items():
+            if now - checked < expire_after:
+                loaded[key] = (checked, [tuple(step) for step in link_report])
+    except (AttributeError, TypeError, ValueError):
+        # Not a link report cache file (eg a link report), so start with an empty cache
+        return
+
+    for key, (checked, link_report) in loaded.items():
+        _URL_CACHE[key] = link_report
+        _URL_CACHE_CHECKED[key] = checked
+
+
+# Status codes other than 2xx and 3xx that are unlikely to change from one run to the next
+_DEFINITIVE_STATUSES = {404, 410}
+
+def _is_definitive(link_report):
+    """Test whether a link report is worth reusing rather than checking the link again."""
+    status = link_report[-1][2]
+    return status is not None and (200 <= status < 400 or status in _DEFINITIVE_STATUSES)
+
+
+def _reusable_report(key, expire_after=_CACHE_EXPIRE_AFTER):
+    """Return the cached link report for a URL cache key if it is definitive and unexpired, else None."""
+    link_report = _URL_CACHE.get(key)
+    if (link_report and _is_definitive(link_report)
+            and time.time() - _URL_CACHE_CHECKED[key] < expire_after):
+        return link_report
+
+
+def save_link_cache(cache_file='linkcheck_cache.json'):
+    """Save cached link reports to a file, omitting links that could not be resolved or that gave temporary errors."""
+    cached = {key: (_URL_CACHE_CHECKED[key], link_report)
+              for key, link_report in _URL_CACHE.items()
+                  if _is_definitive(link_report)}
+    write_json_report(cached, cache_file)
+
+
+# -
+
+# Checking links one at a time means we spend most of our time waiting for web servers to respond. Rather than wait for each request to complete before making the next one, we can use `asyncio` and `aiohttp` to have lots of requests in flight at the same time.
+#
+# To play nice, the total number of requests in flight is limited, as is the number of simultaneous requests to any particular host, and the rate at which requests are made to any particular host. Requests to different hosts don't hold each other up. Requests that fail with a temporary server error are retried a few times, backing off between attempts.
+
+# +
+# Run link checks over a set of links concurrently
+
+import asyncio
+import aiohttp
+
+class _Throttler:
+    """Async context manager that allows at most rate_limit entries per period (in seconds)."""
+
+    def __init__(self, rate_limit, period=1.0):
+        # Space entries out evenly, which also works for rates of less than one per period
+        self.interval = period / rate_limit
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def __aenter__(self):
+        async with self._lock:
+            wait = self._next - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next = time.monotonic() + self.interval
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+
+def _run_async(coro):
+    """Run a coroutine to completion, even if an event loop is already running (eg in Jupyter)."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coro).result()
+
+
+def _retry_delay(retry_after, attempt, backoff_factor=0.3):
+    """Number of seconds to wait before retrying a request, honouring any Retry-After header (up to a limit)."""
+    try:
+        delay = max(0.0, float(retry_after))
+    except (TypeError, ValueError):
+        # No Retry-After header (or an HTTP date), so back off exponentially
+        delay = backoff_factor * 2 ** attempt
+    return min(delay, _MAX_RETRY_AFTER)
+
+
+async def _check_one(session, semaphore, throttler, url, display=False, redirect_log=True,
+                     method='auto', timeout=(5, 10), retries=3):
+    """Attempt to resolve a URL asynchronously and report on how it was resolved.
+    
+    The `throttler` limits the rate of requests to the URL's host, including any retries.
+    The `timeout` is a (connect, read) pair of timeouts in seconds.
+    Temporary server errors are retried up to `retries` times."""
+
+    def _step_reports(r):
+        # Optionally create a report including each step of redirection/resolution
+        steps = list(r.history) + [r] if redirect_log else [r]
+        return [(step.ok, str(step.url), step.status, step.reason, step.method) for step in steps]
+
+    if display:
+        print(f"Checking {url}...")
+
+    client_timeout = aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+    for attempt in range(retries + 1):
+        # Make request and follow redirects, waiting for the throttler before every request
+        try:
+            if method != 'get':
+                async with throttler, semaphore:
+                    async with session.head(url, allow_redirects=True, timeout=client_timeout) as r:
+                        step_reports = _step_reports(r)
+            if method == 'get' or (method == 'auto' and r.status in _HEAD_FALLBACK_STATUSES):
+                # Only the response headers are read, not the body
+                async with throttler, semaphore:
+                    async with session.get(url, allow_redirects=True, timeout=client_timeout) as r:
+                        step_reports = _step_reports(r)
+        except Exception:
+            return [(False, url, None, "Error resolving URL", None)]
+
+        if r.status not in _RETRY_STATUSES or attempt == retries:
+            break
+        # Back off before trying again, without holding up requests to other hosts
+        await asyncio.sleep(_retry_delay(r.headers.get('Retry-After'), attempt))
+
+    if display:
+        for step_report in step_reports:
+            print('\tok={} :: {} :: {} :: {} :: {}\n'.format(*step_report))
+
+    return step_reports
+
+
+def _unchecked_report(url):
+    """Report on a URL that can't be checked with an HTTP request, or return None if it can be."""
+    try:
+        scheme = urlsplit(url).scheme.lower()
+    except ValueError:
+        return [(False, url, None, "Error resolving URL", None)]
+    if scheme not in ('http', 'https'):
+        return [(False, url, None, "Unsupported scheme", None)]
+
+
+async def _check_all(urls, display=False, redirect_log=True, concurrency=20, progress=True,
+                     method='auto', per_host=4, max_rate=5, expire_after=_CACHE_EXPIRE_AFTER):
+    """Check a list of URLs concurrently, returning a dict of link reports keyed by URL."""
+    keys = {url: _normalise_url(url) for url in urls}
+
+    # Only check URLs we don't already have a reusable cached report for,
+    # and don't send requests for URLs that can't be checked
+    pending = {}
+    for url, key in keys.items():
+        if _reusable_report(key, expire_after):
+            continue
+        link_report = _unchecked_report(url)
+        if link_report:
+            _cache_report(key, link_report)
+        else:
+            pending.setdefault(key, url)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    # Wait for a slot on the host before taking one of the overall slots
+    # so that a busy host doesn't hold up requests to other hosts
+    host_semaphores = defaultdict(lambda: asyncio.Semaphore(per_host))
+    host_throttlers = defaultdict(lambda: _Throttler(max_rate))
+    # Many links share a host, so cache DNS lookups for the length of a typical run
+    connector = aiohttp.TCPConnector(limit=64, limit_per_host=per_host,
+                                     use_dns_cache=True, ttl_dns_cache=300)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        with tqdm(total=len(pending), disable=not progress) as pbar:
+            async def _check(url):
+                host = urlsplit(url).netloc
+                async with host_semaphores[host]:
+                    link_report = await _check_one(session, semaphore, host_throttlers[host], url,
+                                                   display, method=method)
+                pbar.update()
+                return link_report
+
+            results = await asyncio.gather(*[_check(url) for url in pending.values()],
+                                           return_exceptions=True)
+
+    for (key, url), link_report in zip(pending.items(), results):
+        if isinstance(link_report, BaseException):
+            link_report = [(False, url, None, "Error resolving URL", None)]
+        _cache_report(key, link_report)
+
+    link_reports = {}
+    for url, key in keys.items():
+        link_report = _URL_CACHE[key]
+        link_reports[url] = link_report if redirect_log else link_report[-1:]
+
+    return link_reports
+
+
+# -
+
 # ## Checking Links from One or More Documents
 #
 # A routine to check links from OU-XML documents found in a directory:
@@ -287,19 +689,21 @@ def link_reporter(url, display=False, redirect_log=True):
 # +
 # Run link checks over a set of links
 
-def check_multiple_links(urls, display=False, redirect_log=True):
-    """Check multiple links."""
+def check_multiple_links(urls, display=False, redirect_log=True, concurrency=20, method='auto',
+                         per_host=4, max_rate=5, dedup=True):
+    """Check multiple links, given as a single URL or an iterable of URLs."""
     
-    # Use unique links
-    urls = list(set(urls)) if isinstance(urls, list) else [urls]
+    if isinstance(urls, str):
+        urls = [urls]
+    elif dedup:
+        # Use unique links, in the order they were given
+        urls = list(dict.fromkeys(urls))
+    else:
+        # The links are already unique (eg `unique_links` from `extract_links_from_docs()`)
+        urls = list(urls)
     
-    link_reports = {}
-    for url in tqdm(urls):
-        play_nice()
-        link_report = link_reporter(url, display, redirect_log)
-        link_reports[url] = link_report
-        
-    return link_reports
+    return _run_async(_check_all(urls, display, redirect_log, concurrency, method=method,
+                                 per_host=per_host, max_rate=max_rate))
 
 
 # + tags=["active-ipynb"]
@@ -334,29 +738,29 @@ def dead_link_report(link_reports):
 
 # We can also create a report per document. This is perhaps more useful because we can see which sections contain which dead links, if any.
 
-def link_reporter_by_docs(doc_links):
+def link_reporter_by_docs(doc_links, concurrency=20, method='auto', per_host=4, max_rate=5):
     """Link reports by document."""
     doc_links_reports = []
     doc_links_nok_reports = []
     
-    unique_link_reports = {}
+    # Only request each unique URL once, checking them all concurrently
+    urls = [url for doc in doc_links
+                for session in doc['sessions']
+                    for (title, url) in doc['sessions'][session]]
+    urls = list(dict.fromkeys(urls))
+    unique_link_reports = _run_async(_check_all(urls, concurrency=concurrency, method=method,
+                                                per_host=per_host, max_rate=max_rate))
     
     for doc in doc_links:
 
         doc_links_report = {'metadata': doc['metadata'], 'sessions': {}}
         doc_links_nok_report = {'metadata': doc['metadata'], 'sessions': {}}
         
-        for session in tqdm(doc['sessions']):
+        for session in doc['sessions']:
             link_reports = []
             nok_link_reports = []
             for (title, url) in doc['sessions'][session]:
-                # Only request each unique URL once
-                if url in unique_link_reports:
-                    link_report = unique_link_reports[url]
-                else:
-                    play_nice()
-                    link_report = link_reporter(url)
-                    unique_link_reports[url] = link_report
+                link_report = unique_link_reports[url]
                 ok = link_report[-1][0]
                 link_reports.append( (title, url, link_report, ok))
                 
@@ -395,24 +799,19 @@ import csv
 def simple_csv_report(links_report, outf='link_report.csv'):
     """Generate a simple CSV link check report."""
 
-    with open(outf, 'w') as f:
+    with open(outf, 'w', newline='', encoding='utf-8', buffering=1<<20) as f:
         write = csv.writer(f)
         cols = ['file', 'code', 'title', 'item', 'session', 'linktext', 'link', 'error']
         write.writerow(cols)
 
         for link_report in links_report:
-            row_base = [link_report['metadata']['file'],
-                        link_report['metadata']['coursecode'],
-                        link_report['metadata']['coursetitle'],
-                        link_report['metadata']['itemtitle']]
+            meta = link_report['metadata']
+            row_base = (meta['file'], meta['coursecode'], meta['coursetitle'], meta['itemtitle'])
 
-            rows = []
-            for session in link_report['sessions']:
-                for link in link_report['sessions'][session]:
-                    row = row_base + [session, link[0], link[1], link[2][-1][-2]]
-                    rows.append(row)
- 
-            write.writerows(rows) 
+            # Rows are generated as they are written, rather than collected in a list first
+            write.writerows((*row_base, session, link[0], link[1], link[2][-1][2])
+                            for session, links in link_report['sessions'].items()
+                                for link in links)
 
 
 # + tags=["active-ipynb"]
@@ -438,19 +837,50 @@ def simple_csv_report(links_report, outf='link_report.csv'):
 # The following function will attempt to submit a URL for archiving on the Internet Archive:
 
 # +
-import json
-import urllib.parse
+from urllib.parse import quote
+
+def _archive_url(url):
+    """Generate the Internet Archive save URL for a link."""
+    quoted_url = quote(url)
+    return f"https://web.archive.org/save/{quoted_url}"
+
 
 def archive_link(url):
     """Submit link archive request to Interet Archive."""
 
-    quoted_url = urllib.parse.quote(url)
-    url_ = f"https://web.archive.org/save/{quoted_url}"
+    url_ = _archive_url(url)
+    wait_for_host(url_)
     # Should probably capture response and generate archive request report
-    r = requests.get(url_, allow_redirects=True)
+    r = _SESSION.get(url_, allow_redirects=True)
     return url, r
 
 
+async def _archive_one(session, semaphore, throttler, url):
+    """Submit link archive request to Internet Archive asynchronously."""
+    async with semaphore, throttler:
+        print(f"Archiving: {url}")
+        try:
+            async with session.get(_archive_url(url), allow_redirects=True) as r:
+                return url, r.ok
+        except Exception:
+            return url, False
+
+
+async def _archive_all(urls, concurrency=4, max_rate=15, period=60):
+    """Submit several links to the Internet Archive at the same time."""
+    # Keep the number and rate of submissions small to respect the Internet Archive's rate limits
+    semaphore = asyncio.Semaphore(concurrency)
+    throttler = _Throttler(max_rate, period)
+    async with aiohttp.ClientSession() as session:
+        with tqdm(total=len(urls)) as pbar:
+            async def _archive(url):
+                result = await _archive_one(session, semaphore, throttler, url)
+                pbar.update()
+                return result
+
+            return await asyncio.gather(*[_archive(url) for url in urls])
+
+
 # -
 
 # It is more likely that we will want to submit multiple URLs to the archiver.
@@ -485,21 +915,23 @@ def get_valid_links(link_reports, include=None, exclude=None):
     return link_reports_, excluded_url, not_valid_url
 
 
-def archive_links(link_reports, include=None, exclude=None):
+def archive_links(link_reports, include=None, exclude=None, concurrency=4):
     """Submit each unique link in a link status report dictionary to the Internet Archive."""
     archived = []
     not_archived = []
 
     link_reports_, excluded_url, not_valid_url = get_valid_links(link_reports, include, exclude)
 
-    for link_ in tqdm(link_reports_):
-        print(f"Archiving: {link_}")
-        url, response = archive_link(link_)
-        if response.ok:
+    # Only submit one of any trivially different forms of the same URL
+    unique_urls = {}
+    for url in link_reports_:
+        unique_urls.setdefault(_normalise_url(url), url)
+
+    for url, ok in _run_async(_archive_all(list(unique_urls.values()), concurrency)):
+        if ok:
             archived.append(url)
         else:
             not_archived.append(url)
-        play_nice()
 
     for url in archived:
         print(f"Archived: {url}")
@@ -515,75 +947,135 @@ def archive_links(link_reports, include=None, exclude=None):
 # archive_links(unique_link_reports)
 # -
 
-# We can generate screenshots for the links:
+# We can generate screenshots for the links, saving each one to a file named after the link URL:
 
-def screenshot_grabber(link_reports, include=None, exclude=None):
-    """Grab screenshots for links."""
-    import unicodedata
-    import string
+# +
+# Generate a safe filename from a URL
+
+import string
+
+valid_filename_chars = "-_.() %s%s" % (string.ascii_letters, string.digits)
+char_limit = 255
 
-    valid_filename_chars = "-_.() %s%s" % (string.ascii_letters, string.digits)
-    char_limit = 255
+def _filename_translation(whitelist):
+    """Create a str.translate() table that deletes any characters not in the whitelist."""
+    return {i: None for i in range(0x100) if chr(i) not in whitelist}
 
-    def clean_filename(filename, whitelist=valid_filename_chars, replace=None):
-        # replace spaces and . by default
-        replace = [" ", "."] if replace is None else replace
-        filename = filename.split("://")[-1]
-        for r in replace:
-            filename = filename.replace(r, '_')
+_FN_TRANS = _filename_translation(valid_filename_chars)
 
-        # keep only valid ascii chars
-        cleaned_filename = unicodedata.normalize('NFKD', filename).encode('ASCII', 'ignore').decode()
+def clean_filename(filename, whitelist=valid_filename_chars, replace=None):
+    # replace spaces and . by default
+    replace = [" ", "."] if replace is None else replace
+    filename = filename.split("://")[-1]
+    for r in replace:
+        filename = filename.replace(r, '_')
 
-        # keep only whitelisted chars
-        cleaned_filename = ''.join(c for c in cleaned_filename if c in whitelist)
-        if len(cleaned_filename)>char_limit:
-            print("Warning, filename truncated because it was over {}. Filenames may no longer be unique".format(char_limit))
-        return cleaned_filename[:char_limit]
+    # keep only valid ascii chars
+    cleaned_filename = unicodedata.normalize('NFKD', filename).encode('ASCII', 'ignore').decode()
 
+    # keep only whitelisted chars
+    trans = _FN_TRANS if whitelist == valid_filename_chars else _filename_translation(whitelist)
+    cleaned_filename = cleaned_filename.translate(trans)
+    if len(cleaned_filename)>char_limit:
+        print("Warning, filename truncated because it was over {}. Filenames may no longer be unique".format(char_limit))
+    return cleaned_filename[:char_limit]
+
+
+# -
+
+def screenshot_grabber(link_reports, include=None, exclude=None, concurrency=6):
+    """Grab screenshots for links."""
     links, excluded_url, not_valid_url = get_valid_links(link_reports, include, exclude)
     
-    from playwright.sync_api import sync_playwright
+    from playwright.async_api import async_playwright
     img_path = "grab_link_screenshots"
     p = Path(img_path)
     p.mkdir(parents=True, exist_ok=True)
-    with sync_playwright() as p:
-        browser = p.webkit.launch()
-        page = browser.new_page()
-        for shot_url in links:
-            try:
-                page.goto(shot_url)
-                page.screenshot(path=Path(img_path) / f"{clean_filename(shot_url)}.png")
-            except:
-                print(f"\t- failed to grab screenshot for {shot_url}")
-        browser.close()
-        print(f"\nScreenshots saved to {img_path}")
+
+    async def grab_all(links):
+        async with async_playwright() as p:
+            browser = await p.webkit.launch()
+            # Grab several screenshots at once, each in its own browser context
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def grab(shot_url):
+                async with semaphore:
+                    context = await browser.new_context()
+                    page = await context.new_page()
+                    try:
+                        await page.goto(shot_url, wait_until='domcontentloaded', timeout=15000)
+                        await page.screenshot(path=Path(img_path) / f"{clean_filename(shot_url)}.png")
+                    except:
+                        print(f"\t- failed to grab screenshot for {shot_url}")
+                    finally:
+                        await context.close()
+
+            await asyncio.gather(*[grab(shot_url) for shot_url in dict.fromkeys(links)])
+            await browser.close()
+
+    _run_async(grab_all(links))
+    print(f"\nScreenshots saved to {img_path}")
 
 
 # + tags=["active-ipynb"]
 # #screenshot_grabber(unique_link_reports)
 # -
 
+# The complete link status reports, and the link report cache, are saved as JSON files. If the `orjson` package is installed, we use that to write them because it is much quicker than the standard `json` package.
+
+# +
+# Write a report as a JSON file
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def write_json_report(report, outf):
+    """Save a report as a JSON file."""
+    if orjson is not None:
+        # Session titles may be None if a session has no title
+        Path(outf).write_bytes(orjson.dumps(report, option=orjson.OPT_NON_STR_KEYS))
+    else:
+        with open(outf, 'w') as f:
+            json.dump(report, f)
+
+
+# -
+
 # We can generate the link status report for links extracted from one or more files, optionally calling the archiver, using the following function:
 
 def link_check_reporter(path,
                         archive=False,
                         strong_archive=False,
                         grab_screenshots=False,
-                        display=False, redirect_log=True):
+                        display=False, redirect_log=True,
+                        method='auto', concurrency=20,
+                        per_host=4, max_rate=5,
+                        cache_file='linkcheck_cache.json', refresh=False,
+                        max_workers=None):
     """Run link checks."""
     print("Getting files...")
     docs = get_xml_files(path)
-    doc_links, unique_links = extract_links_from_docs(docs)
+    doc_links, unique_links = extract_links_from_docs(docs, max_workers=max_workers)
+
+    # Reuse link reports from previous runs unless we want to check every link again
+    if refresh:
+        clear_link_cache()
+    elif cache_file:
+        load_link_cache(cache_file)
 
     print("Getting link statuses for each document section...")
-    link_reports, bad_link_reports, unique_link_reports = link_reporter_by_docs(doc_links)
+    link_reports, bad_link_reports, unique_link_reports = link_reporter_by_docs(doc_links, concurrency=concurrency,
+                                                                                method=method, per_host=per_host,
+                                                                                max_rate=max_rate)
+
+    if cache_file:
+        save_link_cache(cache_file)
 
     print("Writing status reports...")
-    with open('all_links_report.json', 'w') as f:
-        json.dump(link_reports, f)
-    with open('broken_links_report.json', 'w') as f:
-        json.dump(bad_link_reports, f)
+    write_json_report(link_reports, 'all_links_report.json')
+    write_json_report(bad_link_reports, 'broken_links_report.json')
     simple_csv_report(bad_link_reports, outf='broken_links_report.csv')
 
     if archive or strong_archive:
@@ -15,10 +15,12 @@ setup(
         'click',
         'requests',
         'tqdm',
-        'lxml'
+        'lxml',
+        'aiohttp'
     ],
     extras_require={
-        'webshot': ['selenium', 'webdriver-manager']
+        'webshot': ['selenium', 'webdriver-manager'],
+        'speedups': ['orjson']
     },
     entry_points='''
         [console_scripts]